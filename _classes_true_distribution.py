@@ -1,12 +1,43 @@
 from dataclasses import dataclass, field
 from typing import Callable, Optional
-from functools import partial
-from _pricing_utils import max_epc_rev, get_epc_rev
+from functools import partial, cached_property
+from _pricing_utils import get_epc_rev
+from scipy.special import log_ndtr
+import numpy as np
 import scipy
 import random
 
 
 
+# Analytic cdfs of the true distributions, with the same parameters as their scipy.stats counterparts
+def uniform_cdf(x, loc, scale):
+     return np.clip((x - loc) / scale, 0, 1)
+
+
+def truncnorm_lower_cdf(z, a, b):
+     # (Phi(z) - Phi(a)) / (Phi(b) - Phi(a)) in log space; accurate unless [a, b] lies far in the upper tail
+     log_a, log_b, log_z = log_ndtr(a), log_ndtr(b), log_ndtr(z)
+     return np.exp(log_z - log_b) * np.expm1(log_a - log_z) / np.expm1(log_a - log_b)
+
+
+def truncnorm_cdf(x, a, b, loc, scale):
+     z = np.clip((x - loc) / scale, a, b)
+     # Mirror intervals in the upper tail into the lower tail so that no difference of cdfs cancels.
+     with np.errstate(divide = "ignore", invalid = "ignore"):
+          return np.where(a > 0, 1 - truncnorm_lower_cdf(-z, -b, -a), truncnorm_lower_cdf(z, a, b))[()]
+
+
+def truncexpon_cdf(x, b, loc, scale):
+     x = np.clip((x - loc) / scale, 0, b)
+     return np.expm1(-x) / np.expm1(-b)
+
+
+def truncpareto_cdf(x, b, c, loc, scale):
+     x = np.clip((x - loc) / scale, 1, c)
+     return np.expm1(-b * np.log(x)) / np.expm1(-b * np.log(c))
+
+
+
 @dataclass
 class TrueDistribution:
      dist_type: str
@@ -21,28 +52,43 @@ class TrueDistribution:
                        "pareto": scipy.stats.truncpareto}
           return func_refs[self.dist_type]
 
-     def get_ideals(self) -> tuple[float, float]:
-          scipy_func = self.get_scipy_func()
-          cdf = partial(scipy_func.cdf, **self.params)
-          ideal_price, ideal_revenue = max_epc_rev(cdf, lower = self.lower, upper = self.upper)
-          return ideal_price, ideal_revenue
+     def get_cdf_func(self) -> Callable:
+          func_refs = {"uniform": uniform_cdf,
+                       "normal": truncnorm_cdf,
+                       "exponential": truncexpon_cdf,
+                       "pareto": truncpareto_cdf}
+          return func_refs[self.dist_type]
+
+     def get_ideals(self, grid_size: int = 4096) -> tuple[float, float]:
+          # Same algorithm as for whole batches, so that every caller reports the same ideals.
+          ideal_prices, ideal_revenues = get_ideals_batch([self], grid_size = grid_size)
+          return ideal_prices[0], ideal_revenues[0]
+
+     @cached_property
+     def ideals(self) -> tuple[float, float]:
+          # The true cdf never changes, so optimize it once per distribution.
+          return self.get_ideals()
+
+     @property
+     def ideal_price(self) -> float:
+          return self.ideals[0]
+
+     @property
+     def ideal_revenue(self) -> float:
+          return self.ideals[1]
      
      def get_actual_revenue(self, actual_price: float) -> float:
-          scipy_func = self.get_scipy_func()
-          cdf = partial(scipy_func.cdf, **self.params)
+          cdf = partial(self.get_cdf_func(), **self.params)
           revenue = get_epc_rev(actual_price, value_cdf = cdf)
           if revenue < 0:
                raise ValueError("Revenue can never be negative!")
           return revenue
      
-     def generate_bids(self, num_bidders: int) -> dict[str, float]:
-          bids = {}
-          for i in range(num_bidders):
-               scipy_func = self.get_scipy_func()
-               bid = scipy_func.rvs(**self.params)
-               if bid < self.lower or bid > self.upper:
-                    raise ValueError("Bid generated outside the common support!")
-               bids[f"bidder{i + 1}"] = bid
+     def generate_bids(self, num_bidders: int) -> np.ndarray:
+          scipy_func = self.get_scipy_func()
+          bids = scipy_func.rvs(**self.params, size = num_bidders)
+          if np.any(bids < self.lower) or np.any(bids > self.upper):
+               raise ValueError("Bid generated outside the common support!")
           return bids
           
      
@@ -100,4 +146,83 @@ class ParetoDistribution(TrueDistribution):
           self.params = {"b": self.b,
                          "c": (self.upper - self.loc) / self.scale,
                          "loc": self.loc,
-                         "scale": self.scale}
\ No newline at end of file
+                         "scale": self.scale}
+
+
+def get_ideals_batch(true_dists: list[TrueDistribution], 
+                     grid_size: int = 4096, 
+                     tol: float = 1e-10) -> tuple[np.ndarray, np.ndarray]:
+     """
+     Finds the ideal prices and revenues of true distributions of the same type and support at once.
+
+     Parameters:
+     - true_dists (list[TrueDistribution]): True distributions to find the ideals of.
+     - grid_size (int): Number of grid points to locate the maximum on (default: 4096).
+     - tol (float): Width of the final bracket around each maximum (default: 1e-10).
+
+     Returns:
+     - Ideal prices (np.ndarray).
+     - Ideal revenues (np.ndarray).
+     """
+     if len({(true_dist.dist_type, true_dist.lower, true_dist.upper) for true_dist in true_dists}) > 1:
+          raise ValueError("All true distributions must be of the same type and support!")
+     lower, upper = true_dists[0].lower, true_dists[0].upper
+
+     # Step 1: Stack each parameter into a column so that every cdf call covers all distributions.
+     cdf_func = true_dists[0].get_cdf_func()
+     params = {key: np.array([true_dist.params[key] for true_dist in true_dists])[:, None] 
+               for key in true_dists[0].params}
+     def get_revenues(prices):
+          return prices * (1 - cdf_func(prices, **params))
+
+     # Step 2: Locate the best grid point of every distribution and bracket it by its neighbours.
+     grid = np.linspace(lower, upper, num = grid_size)
+     grid_revenues = get_revenues(grid[None, :])
+     best = grid_revenues.argmax(axis = 1)
+     best_prices = grid[best]
+     best_revenues = grid_revenues[np.arange(len(true_dists)), best]
+     a = grid[np.maximum(best - 1, 0)][:, None]
+     b = grid[np.minimum(best + 1, grid_size - 1)][:, None]
+
+     # Step 3: Shrink all brackets together by golden-section search on the exact cdfs.
+     invphi = (np.sqrt(5) - 1) / 2
+     c = b - invphi * (b - a)
+     d = a + invphi * (b - a)
+     fc = get_revenues(c)
+     fd = get_revenues(d)
+     while np.max(b - a) > tol:
+          left = fc > fd # the maximum lies in [a, d]
+          a, b = np.where(left, a, c), np.where(left, d, b)
+          x = np.where(left, b - invphi * (b - a), a + invphi * (b - a))
+          fx = get_revenues(x)
+          c, fc, d, fd = (np.where(left, x, d), np.where(left, fx, fd), 
+                          np.where(left, c, x), np.where(left, fc, fx))
+     prices = ((a + b) / 2).ravel()
+     revenues = get_revenues((a + b) / 2).ravel()
+
+     # Step 4: Keep the best grid point wherever the search ended up worse, e.g., on steep boundary maxima.
+     is_grid_better = best_revenues > revenues
+     prices = np.where(is_grid_better, best_prices, prices)
+     revenues = np.where(is_grid_better, best_revenues, revenues)
+     if np.any(revenues < 0):
+          raise ValueError("Revenue can never be negative!")
+
+     # Return
+     return prices, revenues
+
+
+
+def cache_ideals(true_dists: list[TrueDistribution]):
+     """
+     Finds and caches the ideals of many true distributions, in one batch per type and support.
+
+     Parameter:
+     - true_dists (list[TrueDistribution]): True distributions to find the ideals of.
+     """
+     groups = {}
+     for true_dist in true_dists:
+          groups.setdefault((true_dist.dist_type, true_dist.lower, true_dist.upper), []).append(true_dist)
+     for group in groups.values():
+          prices, revenues = get_ideals_batch(group)
+          for true_dist, price, revenue in zip(group, prices.tolist(), revenues.tolist()):
+               true_dist.ideals = (price, revenue)
@@ -0,0 +1,21 @@
+import pickle
+
+
+
+# Read back a file written as a sequence of pickled chunks
+def loadall(filename):
+    """
+    Reads back every object pickled one after another into a file, e.g., one checkpoint per round.
+
+    Parameter:
+    - filename (str): Path of the file.
+
+    Return:
+    - Generator of the pickled objects, in the order they were written.
+    """
+    with open(filename, "rb") as f:
+        while True:
+            try:
+                yield pickle.load(f)
+            except EOFError:
+                break
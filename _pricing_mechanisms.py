@@ -1,5 +1,5 @@
-from _pricing_utils import opt, dict_part, max_epc_rev
-from _py_density_estimation import kde_py, rde_testing_py
+from _pricing_utils import bid_values, opt, opt_leave_one_out, bids_part, max_epc_rev, max_epc_rev_tabulated
+from _py_density_estimation import py2r, kde_py, rde_testing_py
 import numpy as np
 
 
@@ -9,20 +9,20 @@ def DOP(bids):
     Runs a deterministic optimal price auction.
 
     Parameter:
-    - bids (dict): Bidders and corresponding bids.
+    - bids (np.ndarray): Bids received.
 
     Returns:
     - Auction price (float).
     """
-    for bidder, bid in bids.items():
-        # Step 1: Find the bidder-specific optimal sale price by excluding the bidder.
-        bids_copy = bids.copy()
-        del bids_copy[bidder]
-        price_bidder = opt(bids_copy)
+    bids = bid_values(bids)
 
-        # Step 2: Decide the uniform price.
-        if bid >= price_bidder:
-            return price_bidder
+    # Step 1: Find the bidder-specific optimal sale prices by excluding each bidder.
+    prices_bidders = opt_leave_one_out(bids)
+
+    # Step 2: Decide the uniform price from the first bidder whose bid reaches their price.
+    winners = np.flatnonzero(bids >= prices_bidders)
+    if len(winners) > 0:
+        return prices_bidders[winners[0]]
 
 
 
@@ -31,13 +31,13 @@ def RSOP(bids, *, random_seed):
     Runs a random sampling optimal price auction.
 
     Parameters:
-    - bids (dict): Bidders and corresponding bids.
+    - bids (np.ndarray): Bids received.
     - random_seed (int): A random seed for all pricing mechanisms to use the same partition.
 
     Returns:
     - Auction price (float).
     """
-    group1, group2 = dict_part(bids, random_seed)
+    group1, group2 = bids_part(bids, random_seed)
 
     price1 = opt(group1)
     price2 = opt(group2)
@@ -51,7 +51,7 @@ def RSKDE(bids, *, lower, upper, random_seed):
     Runs a random sampling kernel density estimation auction.
 
     Parameters:
-    - bids (dict): Bidders and corresponding bids.
+    - bids (np.ndarray): Bids received.
     - lower (float): Lower limit for bidder values and bids.
     - upper (float): Upper limit for bidder values and bids.
     - random_seed (int): A random seed for all pricing mechanisms to use the same partition.
@@ -61,21 +61,22 @@ def RSKDE(bids, *, lower, upper, random_seed):
     - Estimated cdfs (tuple[Callable, Callable]).
     """
     # Step 1: Partition bids into two groups.
-    group1, group2 = dict_part(bids, random_seed)
+    group1, group2 = bids_part(bids, random_seed)
 
-    # Step 2: Estimate density within each group.
-    cdf1 = kde_py([*group1.values()], lower, upper)
-    cdf2 = kde_py([*group2.values()], lower, upper)
+    # Step 2: Estimate density within each group and tabulate the estimated cdfs on a grid.
+    grid = np.linspace(lower, upper, num = 1024)
+    cdf1 = np.array(kde_py(group1.tolist(), lower, upper)(py2r(grid.tolist())))
+    cdf2 = np.array(kde_py(group2.tolist(), lower, upper)(py2r(grid.tolist())))
 
     # Step 3: Find the optimal estimated price for each group.
-    price1, rev1 = max_epc_rev(cdf1, lower, upper)
-    price2, rev2 = max_epc_rev(cdf2, lower, upper)
+    price1, rev1 = max_epc_rev_tabulated(grid, cdf1, lower, upper)
+    price2, rev2 = max_epc_rev_tabulated(grid, cdf2, lower, upper)
 
     # Return
     if price1 > price2:
-        return price1, np.array([cdf1(x) for x in np.linspace(lower, upper, num = 1024)])
+        return price1, cdf1
     else:
-        return price2, np.array([cdf2(x) for x in np.linspace(lower, upper, num = 1024)])
+        return price2, cdf2
 
 
 
@@ -84,7 +85,7 @@ def RSRDE(bids, *, lower, upper, random_seed, method = "MLE", training_results):
     Runs a random sampling repeated density estimation auction.
 
     Parameters:
-    - bids (dict): Bidders and corresponding bids.
+    - bids (np.ndarray): Bids received.
     - lower (float): Lower limit for bidder values and bids.
     - upper (float): Upper limit for bidder values and bids.
     - random_seed (int): A random seed for all pricing mechanisms to use the same partition.
@@ -96,14 +97,14 @@ def RSRDE(bids, *, lower, upper, random_seed, method = "MLE", training_results):
     - Estimated cdfs (tuple[Callable, Callable]).
     """ 
     # Step 1: Partition bids into two groups.
-    group1, group2 = dict_part(bids, random_seed)
+    group1, group2 = bids_part(bids, random_seed)
 
     # Step 2: Estimate density within each group.
-    cdf1 = rde_testing_py(test_obs_at_t = [*group1.values()], 
+    cdf1 = rde_testing_py(test_obs_at_t = group1.tolist(), 
                           method = method,
                           lower = lower,
                           training_results = training_results)
-    cdf2 = rde_testing_py(test_obs_at_t = [*group2.values()], 
+    cdf2 = rde_testing_py(test_obs_at_t = group2.tolist(), 
                           method = method,
                           lower = lower,
                           training_results = training_results)
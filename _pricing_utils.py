@@ -1,67 +1,141 @@
-import random
-from functools import partial
 from scipy.optimize import minimize_scalar, basinhopping
+from numba import njit
 import numpy as np
 
 
+# Read bid values into an array
+def bid_values(bids) -> np.ndarray:
+    """
+    Reads bids into a flat array of bid values.
+
+    Parameter:
+    - bids (np.ndarray or dict): Bids received, or bidders and corresponding bids (as in older pickled data).
+
+    Return:
+    - Bid values (np.ndarray).
+    """
+    if isinstance(bids, dict):
+        return np.fromiter(bids.values(), dtype = np.float64, count = len(bids))
+    return np.asarray(bids, dtype = np.float64)
+
+
+
+# Find the maximum expected per capita revenue under the empirical cdf - max_p p(1-F_n(p))
+def max_epc_rev_ecdf(sample):
+    """
+    Maximizes the expected per capita revenue under the empirical cdf of a sample, i.e., max_p p(1 - F_n(p)),
+    where a buyer accepts any price up to their value. The maximum is attained at a sample value, 
+    namely the p = b_i maximizing i * b_i / n over the sample sorted in descending order.
+
+    Parameter:
+    - sample (np.ndarray): Sample of buyers' values (or bids).
+
+    Return:
+    - Optimal price (maximum point) (float).
+    - Optimal expected per capita revenue (maximum) (float).
+    """
+    # Step 1: Sort the sample in descending order
+    sorted_sample = np.sort(bid_values(sample))[::-1]
+    
+    # Step 2: Calculate revenues based on each value, i.e., (index + 1) * value
+    revenues = sorted_sample * np.arange(1, len(sorted_sample) + 1)
+
+    # Step 3: Locate the value with the maximum revenue
+    best = revenues.argmax()
+
+    # Return
+    return sorted_sample[best], revenues[best] / len(sorted_sample)
+
+
+
 # Find the optimal price - max ib_i
-def opt(bids: dict) -> float:
+def opt(bids) -> float:
     """
     Finds the optimal price that maximizes revenue gained from bids received.
 
     Parameter:
-    - bids (dict): Bidders and corresponding bids.
+    - bids (np.ndarray): Bids received.
 
     Return:
     - Optimal sale price (float).
     """
-    # Step 1: Sort bids in descending order
-    sorted_bids = dict(sorted(bids.items(), key = lambda item: item[1], reverse = True))
-    
-    # Step 2: Calculate revenues based on each bid
-    revenues = {bidder: (index + 1) * bid for index, (bidder, bid) in enumerate(sorted_bids.items())}
+    # The revenue from the bids is n times the expected per capita revenue under their empirical cdf.
+    price, _ = max_epc_rev_ecdf(bids)
+    return price
 
-    # Step 3: Locate the maximum revenue according to the bidder
-    max_bidder = max(revenues, key = revenues.get)
 
-    # Step 4: Backtrack the optimal price
-    price = bids[max_bidder]
 
-    # Return
-    return price
+# Find the optimal price without each bidder in turn - max ib_i over all bids but one
+def opt_leave_one_out(bids) -> np.ndarray:
+    """
+    Finds, for every bidder, the optimal price that maximizes revenue gained from all other bids,
+    i.e., opt applied to the bids with that bidder excluded, from a single sort.
+
+    Parameter:
+    - bids (np.ndarray): Bids received (at least two).
+
+    Return:
+    - Optimal sale prices excluding each bidder, in the order of the bids (np.ndarray).
+    """
+    bids = bid_values(bids)
+    n = len(bids)
+    if n < 2:
+        raise ValueError("At least two bids are needed to exclude one!")
+    ranks = np.arange(n)
 
+    # Step 1: Sort bids in descending order once
+    order = np.argsort(-bids, kind = "stable")
+    sorted_bids = bids[order]
 
+    # Step 2: Calculate revenues of each bid once a higher- or lower-ranked bid is excluded
+    revenues_above = (ranks + 1) * sorted_bids # the excluded bid ranks lower, so the rank is kept
+    revenues_below = ranks * sorted_bids # the excluded bid ranks higher, so the rank moves up by one
 
-# Partition a dictionary
-def dict_part(input_dict, random_seed, prop = 0.5):
+    # Step 3: Track the maximum revenue (first rank on ties) among the higher ranks ...
+    prefix_max = np.maximum.accumulate(revenues_above)
+    prefix_arg = np.maximum.accumulate(np.where(revenues_above > np.concatenate(([-np.inf], prefix_max[:-1])), ranks, 0))
+    # ... and among the lower ranks
+    reversed_max = np.maximum.accumulate(revenues_below[::-1])
+    reversed_arg = np.maximum.accumulate(np.where(revenues_below[::-1] >= np.concatenate(([-np.inf], reversed_max[:-1])), ranks, 0))
+    suffix_max = reversed_max[::-1]
+    suffix_arg = n - 1 - reversed_arg[::-1]
+
+    # Step 4: Combine the ranks above and below each excluded rank; ranks above come first on ties
+    above_max = np.concatenate(([-np.inf], prefix_max[:-1]))
+    above_arg = np.concatenate(([0], prefix_arg[:-1]))
+    below_max = np.concatenate((suffix_max[1:], [-np.inf]))
+    below_arg = np.concatenate((suffix_arg[1:], [0]))
+    prices = sorted_bids[np.where(above_max >= below_max, above_arg, below_arg)]
+
+    # Return in the order of the bids
+    return prices[np.argsort(order)]
+
+
+
+# Partition bids
+def bids_part(bids, random_seed, prop = 0.5):
     """
-    Partitions a disctionary into two.
+    Partitions bids into two groups.
 
     Parameter:
-    - input_dict (dict): Dictionary to be partitioned.
+    - bids (np.ndarray): Bids to be partitioned.
     - random_seed (int): A random seed for all pricing mechanisms to use the same partition.
-    - prop (float): Proportion of items assigned to the first partition (default = 0.5).
+    - prop (float): Proportion of bids assigned to the first group (default = 0.5).
 
     Returns:
-    - New dictionary 1 (dict).
-    - New dictionary 2 (dict).
+    - Bids in group 1 (np.ndarray).
+    - Bids in group 2 (np.ndarray).
     """
-    keys = list(input_dict.keys())
-
-    # Calculate the number of keys for the first partition
-    dict1_size = int(len(keys) * prop)
+    bids = bid_values(bids)
 
-    # Randomly sample keys for the first partition
-    random.seed(random_seed) # to make sure all pricing mechanisms are compared based on the same bids partition
-    dict1_keys = random.sample(keys, dict1_size)
+    # Calculate the number of bids for the first group
+    group1_size = int(len(bids) * prop)
 
-    # Create the first partition
-    dict1 = {key: input_dict[key] for key in dict1_keys}
+    # Randomly permute positions and cut them into the two groups
+    rng = np.random.default_rng(random_seed) # to make sure all pricing mechanisms are compared based on the same bids partition
+    perm = rng.permutation(len(bids))
 
-    # Create the second partition with the remaining keys
-    dict2 = {key: input_dict[key] for key in keys if key not in dict1_keys}
-
-    return dict1, dict2
+    return bids[perm[:group1_size]], bids[perm[group1_size:]]
 
 
 
@@ -83,6 +157,143 @@ def get_epc_rev(price, *, value_cdf):
 
 
 
+# Calculate the negative expected per capita revenue from a tabulated cdf - -p(1-F(p))
+@njit(cache = True)
+def neg_epc_rev_tabulated(price, grid, cdf_grid):
+    """
+    Calculates the negative expected per capita revenue given the value cdf tabulated on a grid, i.e., -p(1 - F(p)).
+    F is linearly interpolated between grid points.
+
+    Parameters:
+    - price (float): Price charged to every buyer.
+    - grid (np.ndarray): Increasing grid points the cdf is tabulated on.
+    - cdf_grid (np.ndarray): Cumulative distribution function of buyers' values evaluated at the grid points.
+
+    Return:
+    - Function value (float).
+    """
+    return -price * (1 - np.interp(price, grid, cdf_grid))
+
+
+
+# Golden-section search for the maximum expected per capita revenue from a tabulated cdf
+@njit(cache = True)
+def golden_max_epc_rev(grid, cdf_grid, lower, upper, tol = 1e-8):
+    """
+    Maximizes the expected per capita revenue given the value cdf tabulated on a grid, i.e., max_p p(1 - F(p)),
+    by golden-section search around the best grid point.
+
+    Parameters:
+    - grid (np.ndarray): Increasing grid points the cdf is tabulated on, spanning [lower, upper].
+    - cdf_grid (np.ndarray): Cumulative distribution function of buyers' values evaluated at the grid points.
+    - lower (float): Lower limit for bidder values and bids.
+    - upper (float): Upper limit for bidder values and bids.
+    - tol (float): Width of the final bracket (default: 1e-8).
+
+    Return:
+    - Optimal price (maximum point) (float).
+    - Optimal expected per capita revenue (maximum) (float).
+    """
+    # Step 1: Locate the best grid point and bracket it by its neighbours
+    best = 0
+    best_revenue = -np.inf
+    for k in range(len(grid)):
+        revenue = grid[k] * (1 - cdf_grid[k])
+        if revenue > best_revenue:
+            best = k
+            best_revenue = revenue
+    a = max(grid[max(best - 1, 0)], lower)
+    b = min(grid[min(best + 1, len(grid) - 1)], upper)
+
+    # Step 2: Shrink the bracket by golden-section search
+    invphi = (np.sqrt(5.0) - 1) / 2
+    c = b - invphi * (b - a)
+    d = a + invphi * (b - a)
+    fc = neg_epc_rev_tabulated(c, grid, cdf_grid)
+    fd = neg_epc_rev_tabulated(d, grid, cdf_grid)
+    while b - a > tol:
+        if fc < fd:
+            b, d, fd = d, c, fc
+            c = b - invphi * (b - a)
+            fc = neg_epc_rev_tabulated(c, grid, cdf_grid)
+        else:
+            a, c, fc = c, d, fd
+            d = a + invphi * (b - a)
+            fd = neg_epc_rev_tabulated(d, grid, cdf_grid)
+    price = (a + b) / 2
+    revenue = -neg_epc_rev_tabulated(price, grid, cdf_grid)
+
+    # Return
+    if best_revenue > revenue:
+        return grid[best], best_revenue
+    return price, revenue
+
+
+
+# Find the maximum expected per capita revenue from a tabulated cdf - max_p p(1-F(p))
+def max_epc_rev_tabulated(grid, cdf_grid, lower, upper):
+    """
+    Maximizes the expected per capita revenue given the value cdf tabulated on a grid, i.e., max_p p(1 - F(p)).
+
+    Parameters:
+    - grid (np.ndarray): Increasing grid points the cdf is tabulated on, spanning [lower, upper].
+    - cdf_grid (np.ndarray): Cumulative distribution function of buyers' values evaluated at the grid points.
+    - lower (float): Lower limit for bidder values and bids.
+    - upper (float): Upper limit for bidder values and bids.
+
+    Return:
+    - Optimal price (maximum point) (float).
+    - Optimal expected per capita revenue (maximum) (float).
+    """
+    grid = np.asarray(grid, dtype = np.float64)
+    cdf_grid = np.asarray(cdf_grid, dtype = np.float64)
+
+    # Step 1: Maximization with the compiled golden-section search
+    price, revenue = golden_max_epc_rev(grid, cdf_grid, lower, upper)
+    if price < lower or price > upper:
+        raise ValueError("Optimal price found outside the common support!")
+    if revenue < 0:
+        raise ValueError("Revenue can never be negative!")
+
+    # Return
+    return price, revenue
+
+
+
+# Calculate the negative expected per capita revenue - -p(1-F(p))
+def neg_epc_rev(price, value_cdf):
+    """
+    Calculates the negative expected per capita revenue, i.e., -p(1 - F(p)), as the objective to minimize.
+
+    Parameters:
+    - price (float): Price charged to every buyer.
+    - value_cdf (callable func): Cumulative distribution function of buyers' values.
+
+    Return:
+    - Function value (float).
+    """
+    return -get_epc_rev(price, value_cdf = value_cdf)
+
+
+
+class RandomDisplacementBounds(object):
+    """random displacement with bounds"""
+    def __init__(self, xmin, xmax, stepsize=0.5):
+        self.xmin = xmin
+        self.xmax = xmax
+        self.stepsize = stepsize
+
+    def __call__(self, x):
+        """take a random step but ensure the new position is within the bounds"""
+        while True:
+            # this could be done in a much more clever way, but it will work for example purposes
+            xnew = x + np.random.uniform(-self.stepsize, self.stepsize, np.shape(x))
+            if np.all(xnew < self.xmax) and np.all(xnew > self.xmin):
+                break
+        return xnew
+
+
+
 # Find the maximum expected per capita revenue - max_p p(1-F(p))
 def max_epc_rev(value_cdf, lower, upper, basinhopping_needed = False):
     """
@@ -98,34 +309,18 @@ def max_epc_rev(value_cdf, lower, upper, basinhopping_needed = False):
     - Optimal price (maximum point) (float).
     - Optimal expected per capita revenue (maximum) (float).
     """
-    # Step 1: Wrap get_epc_rev with the given value cdf and extra arguments if any
-    wrapped_get_epc_rev = partial(get_epc_rev, value_cdf = value_cdf)
-
-    # Step 2: Maximization
+    # Step 1: Maximization of get_epc_rev with the given value cdf
     if not basinhopping_needed:
-        results = minimize_scalar(lambda x: -wrapped_get_epc_rev(x), 
+        results = minimize_scalar(neg_epc_rev, 
+                                  args = (value_cdf,),
                                   method='bounded', 
                                   bounds = (lower, upper))
     else:
-        class RandomDisplacementBounds(object):
-            """random displacement with bounds"""
-            def __init__(self, xmin, xmax, stepsize=0.5):
-                self.xmin = xmin
-                self.xmax = xmax
-                self.stepsize = stepsize
-
-            def __call__(self, x):
-                """take a random step but ensure the new position is within the bounds"""
-                while True:
-                    # this could be done in a much more clever way, but it will work for example purposes
-                    xnew = x + np.random.uniform(-self.stepsize, self.stepsize, np.shape(x))
-                    if np.all(xnew < self.xmax) and np.all(xnew > self.xmin):
-                        break
-                return xnew
-        results = basinhopping(lambda x: -wrapped_get_epc_rev(x), 
+        results = basinhopping(neg_epc_rev, 
                                x0 = lower + 0.1, 
                                minimizer_kwargs = {"method": "L-BFGS-B",
-                                                   "bounds": [(lower, upper)]}, 
+                                                   "bounds": [(lower, upper)],
+                                                   "args": (value_cdf,)}, 
                                take_step = RandomDisplacementBounds(lower, upper))
     price = results.x
     revenue = -results.fun
@@ -12,13 +12,16 @@ def py2r(obj):
     Converts a Python (nested) numeric list to an R object.
 
     Parameter:
-    - obj (any): A Python object.
+    - obj (any): A Python object (R numeric vectors inside are kept as they are).
 
     Return:
     - An R object.
     """
     #print("######")
-    if isinstance(obj, list):
+    if isinstance(obj, robjects.vectors.FloatVector):
+        # already converted, e.g., rounds of a training history converted once as they arrive
+        return obj
+    elif isinstance(obj, list):
         vals = [py2r(item) for item in obj]
         #print("obj", obj)
         #print("vals", vals)
@@ -80,6 +83,16 @@ def r2py_func_wrapper(func):
 
 
 
+# Source the density estimation functions in R
+@functools.lru_cache(maxsize = None)
+def source_r_density_estimation():
+    """
+    Sources the density estimation functions in R, once per process.
+    """
+    robjects.r('''source('_r_density_estimation.r')''')
+
+
+
 # Calculate the bandwidth
 def get_bw(obs_at_t):
     """
@@ -120,7 +133,7 @@ def kde_py(observations, lower, upper):
     - The estimated cdf function.
     """
     # import density estimation functions in r
-    robjects.r('''source('_r_density_estimation.r')''')
+    source_r_density_estimation()
 
     observations = py2r(observations)
     cdf = robjects.r["kde_r"](observations, lower, upper)
@@ -148,7 +161,7 @@ def rde_training_py(*, train_hist, train_bws, lower, upper, grid_size = 1024):
     - fpca_den_fam_pdf (R function): Estimated pdf function of the family.
     """
     # import density estimation functions in r
-    robjects.r('''source('_r_density_estimation.r')''')
+    source_r_density_estimation()
     
     # Step 1: Convert all Python inputs to acceptible R inputs. 
     params = locals()
@@ -177,7 +190,7 @@ def rde_testing_py(*, test_obs_at_t, method = "MLE", lower, training_results):
     - The estimated cdf function.
     """
     # import density estimation functions in r
-    robjects.r('''source('_r_density_estimation.r')''')
+    source_r_density_estimation()
 
     # Step 1: Convert all Python inputs to acceptible R inputs. 
     test_obs_at_t = py2r(test_obs_at_t)
@@ -1,25 +1,105 @@
-from _classes_true_distribution import UniformDistribution, NormalDistribution, ExponentialDistribution, ParetoDistribution
+from _classes_true_distribution import TrueDistribution, UniformDistribution, NormalDistribution, ExponentialDistribution, ParetoDistribution
+import numpy as np
 import pickle
 import sys
 
 
 
+true_dist_refs = {"uniform": UniformDistribution,
+                  "normal": NormalDistribution,
+                  "exponential": ExponentialDistribution,
+                  "pareto": ParetoDistribution}
+
+
+
+def simulate_true_dists(dist_type: str, 
+                        num_dists: int, 
+                        lower = 1, 
+                        upper = 10, 
+                        rng = None) -> list[TrueDistribution]:
+    """
+    Simulates true distributions of the same type with randomly drawn parameters.
+
+    Parameters:
+    - dist_type (str): Type of the true distributions ("uniform", "normal", "exponential", "pareto").
+    - num_dists (int): Number of true distributions to simulate.
+    - lower (float): Lower limit for bidder values and bids.
+    - upper (float): Upper limit for bidder values and bids.
+    - rng (np.random.Generator): Random number generator to draw the parameters with (default: None, i.e., a fresh one).
+
+    Return:
+    - Simulated true distributions (list[TrueDistribution]).
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+
+    # Step 1: Draw each parameter for all distributions at once (same ranges as the defaults in __post_init__).
+    if dist_type == "uniform":
+        dist_kwargs = [{} for _ in range(num_dists)]
+    elif dist_type == "normal":
+        means = rng.uniform(0, 2 * upper, size = num_dists)
+        sds = rng.uniform(0, upper, size = num_dists)
+        dist_kwargs = [{"mean": mean, "sd": sd} for mean, sd in zip(means.tolist(), sds.tolist())]
+    elif dist_type == "exponential":
+        scales = rng.uniform(0, upper, size = num_dists)
+        dist_kwargs = [{"scale": scale} for scale in scales.tolist()]
+    elif dist_type == "pareto":
+        bs = rng.uniform(2, upper, size = num_dists)
+        scales = rng.uniform(0, upper, size = num_dists)
+        dist_kwargs = [{"b": b, "scale": scale} for b, scale in zip(bs.tolist(), scales.tolist())]
+    else:
+        raise ValueError("Distribution type not recognized!")
+
+    # Step 2: Assemble the distributions from the drawn parameters.
+    return [true_dist_refs[dist_type](dist_type = dist_type, lower = lower, upper = upper, **kwargs) for kwargs in dist_kwargs]
+
+
+
+def simulate_bids(true_dists: list[TrueDistribution], 
+                  num_bidders: int, 
+                  rng = None) -> np.ndarray:
+    """
+    Simulates bids from true distributions of the same type in one batched draw.
+
+    Parameters:
+    - true_dists (list[TrueDistribution]): True distributions to draw bids from.
+    - num_bidders (int): Number of bidders (bids) per distribution.
+    - rng (np.random.Generator): Random number generator to draw the bids with (default: None, i.e., a fresh one).
+
+    Return:
+    - Bids for each distribution, one row per distribution (np.ndarray).
+    """
+    if len({true_dist.dist_type for true_dist in true_dists}) > 1:
+        raise ValueError("All true distributions must be of the same type!")
+    if rng is None:
+        rng = np.random.default_rng()
+
+    # Step 1: Stack each parameter into a column so that it broadcasts against the bidders.
+    params = {key: np.array([true_dist.params[key] for true_dist in true_dists])[:, None] 
+              for key in true_dists[0].params}
+
+    # Step 2: Draw all bids at once, one row per distribution.
+    scipy_func = true_dists[0].get_scipy_func()
+    bids = scipy_func.rvs(**params, size = (len(true_dists), num_bidders), random_state = rng)
+    lowers = np.array([true_dist.lower for true_dist in true_dists])[:, None]
+    uppers = np.array([true_dist.upper for true_dist in true_dists])[:, None]
+    if np.any(bids < lowers) or np.any(bids > uppers):
+        raise ValueError("Bid generated outside the common support!")
+
+    # Return
+    return bids
+
+
+
 def get_training_bids(dist_type: str, 
                       repetition_no: str,
                       num_bidders = 500,
                       num_rounds = 100, 
                       lower = 1, 
                       upper = 10):
-    true_dist_refs = {"uniform": UniformDistribution,
-                      "normal": NormalDistribution,
-                      "exponential": ExponentialDistribution,
-                      "pareto": ParetoDistribution}
-    
-    training_bids = []
-    for t in range(num_rounds):
-        true_dist = true_dist_refs[dist_type](dist_type = dist_type, lower = lower, upper = upper)
-        training_bids_at_t = true_dist.generate_bids(num_bidders = num_bidders)
-        training_bids.append(training_bids_at_t)
+    rng = np.random.default_rng()
+    true_dists = simulate_true_dists(dist_type = dist_type, num_dists = num_rounds, lower = lower, upper = upper, rng = rng)
+    training_bids = simulate_bids(true_dists, num_bidders = num_bidders, rng = rng)
 
     with open("data/sim/" + dist_type + "/train_bids_" + dist_type + "_rep" + str(repetition_no) + ".pkl", "wb") as file:
         pickle.dump(training_bids, file)
@@ -31,14 +111,9 @@ def get_testing_info(dist_type: str,
                      num_bidders = 500,
                      lower = 1, 
                      upper = 10):
-    true_dist_refs = {"uniform": UniformDistribution,
-                      "normal": NormalDistribution,
-                      "exponential": ExponentialDistribution,
-                      "pareto": ParetoDistribution}
-    
     true_dist = true_dist_refs[dist_type](dist_type = dist_type, lower = lower, upper = upper)
     testing_bids = true_dist.generate_bids(num_bidders = num_bidders)
-    ideal_price, ideal_revenue = true_dist.get_ideals()
+    ideal_price, ideal_revenue = true_dist.ideals
     testing_info = {"true_dist": true_dist,
                     "testing_bids": testing_bids,
                     "ideal_price": ideal_price,
@@ -1,7 +1,11 @@
 import os
 os.environ['R_HOME'] = '/u/home/y/yqg36/.conda/envs/rpy2-env/lib/R'
 from _classes_auction import Auction, DOPAuction, RSOPAuction, RSKDEAuction, RSRDEAuction
-import dill
+from _classes_true_distribution import cache_ideals
+from _pickle_utils import loadall
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+import pickle
 import gc
 import sys
 import time
@@ -9,97 +13,107 @@ import numpy as np
 
 
 
-def loadall(filename, method):
-    with open(filename, "rb") as f:
-        while True:
-            try:
-                if method == "RSKDE":
-                    auctions = dill.load(f)
-                    if auctions is not None:
-                        regrets = [auction.regret for auction in auctions]
-                        yield np.mean(regrets), np.std(regrets)
-                elif method == "RSRDE":
-                    yield dill.load(f)
-            except EOFError:
-                break
+def load_rounds(filename, method):
+    for auctions in loadall(filename):
+        if method == "RSKDE":
+            if auctions is not None:
+                regrets = [auction.regret for auction in auctions]
+                yield np.mean(regrets), np.std(regrets)
+        elif method == "RSRDE":
+            yield auctions
 
                 
 
-def run_auctions(initializations_name: str, pricing_mechanism: str, is_continue: str) -> list[Auction]:
+def write_checkpoint(file, auctions):
+    pickle.dump(auctions, file, protocol = pickle.HIGHEST_PROTOCOL)
+    file.flush()
+
+
+
+# RSRDE training history, sent to each worker process once instead of with every round
+worker_training_history = None
+
+def init_worker(training_history):
+    global worker_training_history
+    worker_training_history = training_history
+
+
+
+def build_round_auctions(init, pricing_mechanism: str, num_seeds = 200):
+    if pricing_mechanism == "DOP":
+        return DOPAuction(initialization = init)
+    elif pricing_mechanism == "RSOP":
+        return [RSOPAuction(initialization = init, random_seed = j) for j in range(num_seeds)]
+    elif pricing_mechanism == "RSKDE":
+        return [RSKDEAuction(initialization = init, random_seed = j) for j in range(num_seeds)]
+    elif pricing_mechanism == "RSRDE":
+        return np.array([RSRDEAuction(initialization = init, random_seed = j, training_history = worker_training_history) for j in range(num_seeds)])
+    else:
+        raise ValueError("Pricing mechanism not recognized!") 
+
+
+
+def run_auctions(initializations_name: str, pricing_mechanism: str, is_continue: str, max_workers = None) -> list[Auction]:
+    # As in run_rsrde: at most 30 workers, and never more than the cores this job may use.
+    if max_workers is None:
+        max_workers = min(30, len(os.sched_getaffinity(0)))
     with open("data/inits/" + initializations_name + ".pkl", "rb") as file:
-        initializations = dill.load(file)
+        initializations = pickle.load(file)
     num_rounds = len(initializations)
+    # Find the ideals of all rounds in one batch before the rounds are handed to the workers.
+    cache_ideals([init.true_dist for init in initializations])
     if is_continue == "Yes":
-        auctions_done = list(loadall("data/Rep200/" + initializations_name + "_" + pricing_mechanism + ".pkl", method = pricing_mechanism))
+        auctions_done = list(load_rounds("data/Rep200/" + initializations_name + "_" + pricing_mechanism + ".pkl", method = pricing_mechanism))
         num_rounds_done = len(auctions_done)
     elif is_continue == "No":
         num_rounds_done = 0
     else: 
         raise ValueError("The third argument is either 'Yes' or 'No'!")
     rounds_to_run = range(num_rounds_done, num_rounds)
+    file_name = "data/Rep200/" + initializations_name + "_" + pricing_mechanism + ".pkl"
     
 
-    if pricing_mechanism == "DOP":
-        DOP_auctions = []
-        for i in range(num_rounds):
-            init = initializations[i]
-            DOP_auction = DOPAuction(initialization = init)
-            DOP_auctions.append(DOP_auction)
-        with open("data/Rep200/" + initializations_name + "_DOP.pkl", "wb") as file:
-            dill.dump(DOP_auctions, file)
-        
-    elif pricing_mechanism == "RSOP":
-        for i in range(num_rounds):
-            init = initializations[i]
-            RSOP_auctions = []
-            for j in range(200):
-                RSOP_auctions.append(RSOPAuction(initialization = init, random_seed = j))
-            if i == 0:
-                with open("data/Rep200/" + initializations_name + "_RSOP.pkl", "wb") as file:
-                    dill.dump(RSOP_auctions, file)
-            else:
-                with open("data/Rep200/" + initializations_name + "_RSOP.pkl", "ab") as file:
-                    dill.dump(RSOP_auctions, file)
-            print(f"Round {i + 1} of {pricing_mechanism} on {initializations_name} done!")
-
-    elif pricing_mechanism == "RSKDE":
-        for i in rounds_to_run:
-            init = initializations[i]
-            RSKDE_auctions = []
-            for j in range(200):
-                RSKDE_auctions.append(RSKDEAuction(initialization = init, random_seed = j))
-            if i == 0:
-                with open("data/Rep200/" + initializations_name + "_RSKDE.pkl", "wb") as file:
-                    dill.dump(RSKDE_auctions, file)
-            else:
-                with open("data/Rep200/" + initializations_name + "_RSKDE.pkl", "ab") as file:
-                    dill.dump(RSKDE_auctions, file)
-            print(f"Round {i + 1} of {pricing_mechanism} on {initializations_name} done!")
-
-    elif pricing_mechanism == "RSRDE":
+    training_history = None
+    if pricing_mechanism == "RSRDE":
         with open("data/RSRDE_training/" + initializations_name + "_RSRDE_training.pkl", "rb") as file:
-            training_results = dill.load(file)
+            training_results = pickle.load(file)
         num_train_rounds = int(initializations_name.split("_")[2])
         training_history = training_results[num_train_rounds]
-        for i in rounds_to_run:
-            init = initializations[i]
-            if i < num_train_rounds:
-                RSRDE_auctions = None
-            else:
-                RSRDE_auctions = []
-                for j in range(200):
-                    RSRDE_auctions.append(RSRDEAuction(initialization = init, random_seed = j, training_history = training_history))
-                RSRDE_auctions = np.array(RSRDE_auctions)
-            if i == 0:
-                with open("data/Rep200/" + initializations_name + "_RSRDE.pkl", "wb") as file:
-                    dill.dump(RSRDE_auctions, file)
-            else:
-                with open("data/Rep200/" + initializations_name + "_RSRDE.pkl", "ab") as file:
-                    dill.dump(RSRDE_auctions, file)
-            print(f"Round {i + 1} of {pricing_mechanism} on {initializations_name} done!")
+    
 
-    else:
-        raise ValueError("Pricing mechanism not recognized!") 
+    # Rounds are independent of each other, so run them in parallel and write them back in order.
+    # Only this process ever writes to the file, so checkpoints need no locking.
+    # Processes rather than threads, since the R session behind rpy2 is not thread-safe.
+    with ProcessPoolExecutor(max_workers = max_workers, 
+                             initializer = init_worker, 
+                             initargs = (training_history,)) as executor:
+        if pricing_mechanism == "DOP":
+            DOP_auctions = list(executor.map(partial(build_round_auctions, pricing_mechanism = "DOP"), 
+                                             initializations[:num_rounds]))
+            with open(file_name, "wb") as file:
+                pickle.dump(DOP_auctions, file, protocol = pickle.HIGHEST_PROTOCOL)
+            
+        elif pricing_mechanism in ["RSOP", "RSKDE"]:
+            rounds = range(num_rounds) if pricing_mechanism == "RSOP" else rounds_to_run
+            round_auctions = executor.map(partial(build_round_auctions, pricing_mechanism = pricing_mechanism), 
+                                          [initializations[i] for i in rounds])
+            with open(file_name, "wb" if rounds.start == 0 else "ab") as file:
+                for i, auctions in zip(rounds, round_auctions):
+                    write_checkpoint(file, auctions)
+                    print(f"Round {i + 1} of {pricing_mechanism} on {initializations_name} done!")
+
+        elif pricing_mechanism == "RSRDE":
+            # Rounds before num_train_rounds only hold places for training and have no auctions.
+            round_auctions = executor.map(partial(build_round_auctions, pricing_mechanism = "RSRDE"), 
+                                          [initializations[i] for i in rounds_to_run if i >= num_train_rounds])
+            with open(file_name, "wb" if rounds_to_run.start == 0 else "ab") as file:
+                for i in rounds_to_run:
+                    RSRDE_auctions = None if i < num_train_rounds else next(round_auctions)
+                    write_checkpoint(file, RSRDE_auctions)
+                    print(f"Round {i + 1} of {pricing_mechanism} on {initializations_name} done!")
+
+        else:
+            raise ValueError("Pricing mechanism not recognized!") 
     
     print(f"All done with {pricing_mechanism} on {initializations_name}!")
     gc.collect()
@@ -111,7 +125,8 @@ def main():
     arg1 = sys.argv[1]
     arg2 = sys.argv[2]
     arg3 = sys.argv[3]
-    run_auctions(arg1, arg2, arg3)
+    arg4 = int(sys.argv[4]) if len(sys.argv) > 4 else None
+    run_auctions(arg1, arg2, arg3, max_workers = arg4)
     print(f"It took {time.time() - t_start} seconds.")
 
 if __name__ == "__main__":
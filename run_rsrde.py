@@ -2,9 +2,9 @@ import os
 os.environ['R_HOME'] = '/u/home/y/yqg36/.conda/envs/rpy2-env/lib/R'
 from concurrent.futures import ProcessPoolExecutor
 import sys
-import pickle
 from initialize_auctions import get_training_bids
 from train_rsrde import train_rsrde
+from _pickle_utils import loadall
 from test_rsrde import test_rsrde
 
 
@@ -29,9 +29,7 @@ def run_rsrde(dist_type: str,
 
 
 def check_length(full_path: str):
-    with open(full_path, "rb") as file:
-        testing_results = pickle.load(file)
-    return len(testing_results)
+    return sum(1 for _ in loadall(full_path))
 
 
 def main():
@@ -54,16 +52,35 @@ def main():
                 if (test_file not in test_files) or (check_length(folder_path + "/" +test_file) != 80):
                     to_runs.append((i, num_training_bids, num_testing_bids))
     
-    futures = []
-    with ProcessPoolExecutor(max_workers=30) as executor:
-        for i, num_training_bids, num_testing_bids in to_runs:
-            futures.append(executor.submit(run_rsrde, 
-                                           dist_type=dist_type, 
-                                           repetition_no=str(i+1),
-                                           num_training_bids=num_training_bids,
-                                           num_testing_bids=num_testing_bids))
-    for future in futures: 
-        future.result()
+    # Each repetition's bids and each (repetition, number of training bids) training run are shared
+    # by several tests, so simulate and train them once before running the tests.
+    repetitions = sorted({i for i, _, _ in to_runs})
+    trainings = sorted({(i, num_training_bids) for i, num_training_bids, _ in to_runs})
+    # At most 30 workers, and never more than the cores this job may use.
+    with ProcessPoolExecutor(max_workers=min(30, len(os.sched_getaffinity(0)))) as executor:
+        futures = [executor.submit(get_training_bids, 
+                                   dist_type=dist_type, 
+                                   repetition_no=str(i+1))
+                   for i in repetitions]
+        for future in futures: 
+            future.result()
+
+        futures = [executor.submit(train_rsrde, 
+                                   dist_type=dist_type, 
+                                   repetition_no=str(i+1), 
+                                   num_training_bids=int(num_training_bids))
+                   for i, num_training_bids in trainings]
+        for future in futures: 
+            future.result()
+
+        futures = [executor.submit(test_rsrde, 
+                                   dist_type=dist_type, 
+                                   repetition_no=str(i+1),
+                                   num_training_bids=num_training_bids,
+                                   num_testing_bids=int(num_testing_bids))
+                   for i, num_training_bids, num_testing_bids in to_runs]
+        for future in futures: 
+            future.result()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
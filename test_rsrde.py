@@ -3,6 +3,8 @@ os.environ['R_HOME'] = '/u/home/y/yqg36/.conda/envs/rpy2-env/lib/R'
 import pickle
 import sys
 from _pricing_mechanisms import RSRDE
+from _pricing_utils import bid_values
+from _pickle_utils import loadall
 
 
 
@@ -11,24 +13,23 @@ def test_rsrde(dist_type: str,
                num_training_bids: str,
                num_testing_bids: int):
     history_training_results_file = "data/sim/" + dist_type + "/train_results_" + dist_type + "_rep" + repetition_no + "_" + num_training_bids + "bids.pkl"
-    with open(history_training_results_file, "rb") as file:
-        history_training_results = pickle.load(file)
+    history_training_results = list(loadall(history_training_results_file))
     
     testing_info_file = "data/sim/" + dist_type + "/test_info_" + dist_type + ".pkl"
     with open(testing_info_file, "rb") as file:
         testing_info = pickle.load(file)
     testing_true_dist = testing_info["true_dist"]
     
-    testing_bids = dict(zip(range(num_testing_bids), [*testing_info["testing_bids"].values()][:num_testing_bids]))
-    testing_results = []
-    for t in range(20, 100):
-        price, _ = RSRDE(testing_bids, lower = 1, upper = 10, random_seed = 666, training_results = history_training_results[t - 20])
-        revenue = testing_true_dist.get_actual_revenue(price)
-        testing_results.append((price, revenue))
-
-        with open("data/sim/" + dist_type + "/test_results_" + dist_type + "_rep" + repetition_no + "_" + num_training_bids + "training_" + str(num_testing_bids) + "testing.pkl", "wb") as file:
-            pickle.dump(testing_results, file)
-        print(f"Done with round {t + 1} of {dist_type} with {num_training_bids} bids per round for {str(num_testing_bids)} testing bids - Repetition No.{repetition_no}!")
+    testing_bids = bid_values(testing_info["testing_bids"])[:num_testing_bids]
+    testing_results_file = "data/sim/" + dist_type + "/test_results_" + dist_type + "_rep" + repetition_no + "_" + num_training_bids + "training_" + str(num_testing_bids) + "testing.pkl"
+    with open(testing_results_file, "wb") as file:
+        for t in range(20, 100):
+            price, _ = RSRDE(testing_bids, lower = 1, upper = 10, random_seed = 666, training_results = history_training_results[t - 20])
+            revenue = testing_true_dist.get_actual_revenue(price)
+            # Checkpoint only the new round; read all rounds back with loadall.
+            pickle.dump((price, revenue), file, protocol = pickle.HIGHEST_PROTOCOL)
+            file.flush()
+            print(f"Done with round {t + 1} of {dist_type} with {num_training_bids} bids per round for {str(num_testing_bids)} testing bids - Repetition No.{repetition_no}!")
 
     print("--------------------")
     print(f"All done with testing on {dist_type} with {num_training_bids} bids per round for {str(num_testing_bids)} testing bids - Repetition No.{repetition_no}!")
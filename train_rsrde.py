@@ -2,7 +2,8 @@ import os
 os.environ['R_HOME'] = '/u/home/y/yqg36/.conda/envs/rpy2-env/lib/R'
 import pickle
 import sys
-from _py_density_estimation import get_bw, rde_training_py
+from _pricing_utils import bid_values
+from _py_density_estimation import py2r, get_bw, rde_training_py
 
 
 
@@ -14,27 +15,28 @@ def train_rsrde(dist_type: str,
 
     history_training_data = []
     history_training_bandwidths = []
-    history_training_results = []
 
     file_name = "data/sim/" + dist_type + "/train_results_" + dist_type + "_rep" + repetition_no + "_" + str(num_training_bids) + "bids.pkl"
-    for t in range(100):
-        if t < 20:
-            pass
-        else:
-            training_results = rde_training_py(train_hist = history_training_data,
-                                               train_bws = history_training_bandwidths,
-                                               lower = 1, upper = 10)
-            history_training_results.append(training_results)
-        
-        training_bids_at_t = [*training_bids[t].values()]
-        bids = training_bids_at_t[:num_training_bids]
-        bandwidth = get_bw(bids)
-        history_training_data.append(bids)
-        history_training_bandwidths.append(bandwidth)
-
-        with open(file_name, "wb") as file:
-            pickle.dump(history_training_results, file)
-        print(f"Done with round {t + 1} of {dist_type} with {num_training_bids} bids per round - Repetition No.{repetition_no}!")
+    with open(file_name, "wb") as file:
+        for t in range(100):
+            if t < 20:
+                pass
+            else:
+                training_results = rde_training_py(train_hist = history_training_data,
+                                                   train_bws = history_training_bandwidths,
+                                                   lower = 1, upper = 10)
+                # Checkpoint only the new round; read the whole history back with loadall.
+                pickle.dump(training_results, file, protocol = pickle.HIGHEST_PROTOCOL)
+                file.flush()
+            
+            training_bids_at_t = bid_values(training_bids[t])
+            # Convert each round to R once as it arrives instead of reconverting the whole history every round.
+            bids = py2r(training_bids_at_t[:num_training_bids].tolist())
+            bandwidth = get_bw(bids)
+            history_training_data.append(bids)
+            history_training_bandwidths.append(bandwidth)
+
+            print(f"Done with round {t + 1} of {dist_type} with {num_training_bids} bids per round - Repetition No.{repetition_no}!")
 
     print("--------------------")
     print(f"All done with RSRDE training on {dist_type} with {num_training_bids} bids per round - Repetition No.{repetition_no}!")